@@ -3,6 +3,7 @@ from langgraph.prebuilt import create_react_agent
 from langgraph.graph.message import add_messages # helper function to add messages to the state
 from langchain_core.tools import tool
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_config import gemini_client_kwargs
 from dotenv import load_dotenv
 import json 
 
@@ -22,34 +23,41 @@ cases = {
     "opposing":  ["cases_20250617/254.json"]
 }
 
-def pull_cases(cases):
+def pull_cases(cases, data_dir='cases_20250617'):
     res =  {
        "supporting":[], 
-       "opposing": []
+       "opposing": [],
+       "related": []
     }
 
     for case in cases["support"]: 
-        with open(os.path.join(os.getcwd(), 'cases_20250617', case['fname']), 'r') as f:
+        with open(os.path.join(data_dir, case['fname']), 'r') as f:
             data = json.load(f)
             res["supporting"].append(data)
 
     for case in cases["oppose"]: 
-        with open(os.path.join(os.getcwd(), 'cases_20250617', case['fname']), 'r') as f:
+        with open(os.path.join(data_dir, case['fname']), 'r') as f:
             data = json.load(f)
             res["opposing"].append(data)
+
+    # retrieved but not stance-scored (research skipped NLI); results from before this bucket existed have none
+    for case in cases.get("retrieved", []):
+        with open(os.path.join(data_dir, case['fname']), 'r') as f:
+            data = json.load(f)
+            res["related"].append(data)
             
     return res
 
 
 
 
-def case_builder(issue, og_prompt, cases, tone) -> str: 
+def case_builder(issue, og_prompt, cases, tone, data_dir='cases_20250617') -> str: 
     
     system_prompt = f"""
         You are a lawyer that specialises in arbitration case building with regards to {issue}. You speak in this {tone}
     """
     prompt = f"""
-        Your colleague came to you with this problem: '{og_prompt}' and wants to tackle it in the context of this issue: '{issue}'. He has pulled out the relevant cases that support or oppose the arguement: '{pull_cases(cases)}'. 
+        Your colleague came to you with this problem: '{og_prompt}' and wants to tackle it in the context of this issue: '{issue}'. He has pulled out the relevant cases that support or oppose the arguement: '{pull_cases(cases, data_dir)}'. 
         
         Your goal is to build a case that your colleague can use to argue his point with regards to the issue.
 
@@ -66,6 +74,7 @@ def case_builder(issue, og_prompt, cases, tone) -> str:
         temperature=1.0,
         max_retries=2,
         google_api_key=api_key,
+        **gemini_client_kwargs(),
     )
 
     # Test the model with tools
@@ -87,12 +96,12 @@ def case_builder(issue, og_prompt, cases, tone) -> str:
     return res["messages"][-1].content
 
 # this is a version of case builder which returns the agent itself
-def case_builder_agent(issue, og_prompt, cases, tone) -> str:
+def case_builder_agent(issue, og_prompt, cases, tone, data_dir='cases_20250617') -> str:
     system_prompt = f"""
         You are a lawyer that specialises in arbitration case building with regards to {issue}. You speak in this {tone}.
     """
     prompt = f"""
-        Your colleague came to you with this problem: '{og_prompt}' and wants to tackle it in the context of this issue: '{issue}'. He has pulled out the relevant cases that support or oppose the arguement: '{pull_cases(cases)}'. 
+        Your colleague came to you with this problem: '{og_prompt}' and wants to tackle it in the context of this issue: '{issue}'. He has pulled out the relevant cases that support or oppose the arguement: '{pull_cases(cases, data_dir)}'. 
         
         Your goal is to build a case that your colleague can use to argue his point with regards to the issue.
 
@@ -109,6 +118,7 @@ def case_builder_agent(issue, og_prompt, cases, tone) -> str:
         temperature=1.0,
         max_retries=2,
         google_api_key=api_key,
+        **gemini_client_kwargs(),
     )
 
     # Test the model with tools
@@ -0,0 +1,67 @@
+"""
+Durable per-stage checkpoints for workflow runs, stored in a local SQLite database.
+
+Every workflow stage result is written as JSON under (run_id, stage) as soon as it completes, so a run that
+fails part-way (e.g. a Gemini error in the concluder) can be resumed without paying for the earlier stages again.
+"""
+
+import json
+import sqlite3
+import threading
+import uuid
+from typing import Any, Callable, Dict
+
+
+class CheckpointStore:
+    def __init__(self, path: str = "checkpoints.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " run_id TEXT NOT NULL, stage TEXT NOT NULL, value TEXT NOT NULL,"
+                " created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,"
+                " PRIMARY KEY (run_id, stage))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # one short-lived connection per call, so stages running on worker threads can checkpoint too
+        return sqlite3.connect(self.path, timeout=30)
+
+    def put(self, run_id: str, stage: str, value: Any):
+        data = json.dumps(value)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO checkpoints (run_id, stage, value) VALUES (?, ?, ?)", (run_id, stage, data))
+
+    def has(self, run_id: str, stage: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM checkpoints WHERE run_id = ? AND stage = ?", (run_id, stage)).fetchone() is not None
+
+    def get(self, run_id: str, stage: str) -> Any:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM checkpoints WHERE run_id = ? AND stage = ?", (run_id, stage)).fetchone()
+        if row is None:
+            raise KeyError("no checkpoint for stage '{}' of run '{}'".format(stage, run_id))
+        return json.loads(row[0])
+
+    def load(self, run_id: str) -> Dict[str, Any]:
+        """Every completed stage of a run."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT stage, value FROM checkpoints WHERE run_id = ?", (run_id,)).fetchall()
+        return {stage: json.loads(value) for stage, value in rows}
+
+
+class Checkpointer:
+    """Runs a stage only if the run has no checkpoint for it yet, and records the result."""
+
+    def __init__(self, store: CheckpointStore, run_id: str = None):
+        self.store = store
+        self.run_id = run_id or uuid.uuid4().hex
+
+    def __call__(self, stage: str, fn: Callable, *args, **kwargs) -> Any:
+        if self.store.has(self.run_id, stage):
+            print("Skipping completed stage:", stage)
+            return self.store.get(self.run_id, stage)
+        result = fn(*args, **kwargs)
+        self.store.put(self.run_id, stage, result)
+        return result
@@ -1,10 +1,9 @@
 import os
 import re
-import json
 import uuid
+import ijson
 import tiktoken
-from typing import List, Dict
-from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSplitter
+from typing import List, Dict, Iterator
 
 enc = tiktoken.get_encoding("cl100k_base")
 
@@ -12,39 +11,71 @@ def split_on_headings(text:str)->List[str]:
     parts = re.split(r'\*\*[IVXL]+\.[A-Z\s]+\*\*', text)
     return [p.strip() for p in parts if p.strip()]
 
-token_splitter = TokenTextSplitter(
-    encoding_name="cl100k_base",
-    chunk_size=700,
-    chunk_overlap=90,
-)
-
-def process_json(fpath: str) -> Dict:
-    with open(fpath) as f:
-        doc = json.load(f)
-        out = []
-        # Every key in the json except for "Decisions" which is the bulk of the content
-        base = {k: doc.get(k) for k in [
-            "Identifier","Title","CaseNumber","Industries","Status",
-            "PartyNationalities","Institution","RulesOfArbitration","ApplicableTreaties"
-        ]}
-        for d_idx, d in enumerate(doc.get("Decisions", [])):
+CHUNK_SIZE = 700
+CHUNK_OVERLAP = 90
+
+BASE_KEYS = [
+    "Identifier","Title","CaseNumber","Industries","Status",
+    "PartyNationalities","Institution","RulesOfArbitration","ApplicableTreaties"
+]
+
+def token_windows(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """
+    Tokenize once and slice overlapping token windows by offset.
+    Produces the same pieces as TokenTextSplitter(chunk_size, chunk_overlap) without re-encoding.
+    """
+    ids = enc.encode(text)
+    start = 0
+    while start < len(ids):
+        end = min(start + chunk_size, len(ids))
+        yield enc.decode(ids[start:end])
+        if end == len(ids):
+            break
+        start += chunk_size - chunk_overlap
+
+def _read_base(fpath: str) -> Dict:
+    """First pass: collect the top-level metadata, skipping over "Decisions" without building it."""
+    base, builders = {}, {}
+    with open(fpath, "rb") as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            key = prefix.split(".", 1)[0]
+            if not prefix or key not in BASE_KEYS:
+                continue
+            builder = builders.setdefault(key, ijson.ObjectBuilder())
+            builder.event(event, value)
+            if prefix == key and event not in ("start_map", "start_array", "map_key"):
+                base[key] = builder.value
+    return {k: base.get(k) for k in BASE_KEYS}
+
+def iter_json(fpath: str) -> Iterator[Dict]:
+    """
+    Stream the chunks of one case file. Decisions are parsed one at a time,
+    so peak memory is bounded by a single decision rather than the whole file.
+    """
+    base = _read_base(fpath)  # base metadata for the whole json file
+    with open(fpath, "rb") as f:
+        for d_idx, d in enumerate(ijson.items(f, "Decisions.item", use_float=True)):
             content = d.get("Content","") or ""
             if not content.strip(): continue
             for sec_idx, sec in enumerate(split_on_headings(content) or [content]):
-                for i, piece in enumerate(token_splitter.split_text(sec)):
-                    out.append({
-                        **base,  # base metadata for the whole json file
+                for i, piece in enumerate(token_windows(sec)):
+                    yield {
+                        **base,
                         "DecisionTitle": d.get("Title"),
                         "DecisionType": d.get("Type"),
                         "DecisionDate": d.get("Date"),
                         "Content": piece,
                         "Span": "dec{}_sec{}_chunk{}".format(d_idx, sec_idx, i),
-                        "ChunkID": "{}|{}|{}|{}".format(doc["Identifier"], d_idx, sec_idx, i)
-                    })
-        return out
+                        "ChunkID": "{}|{}|{}|{}".format(base["Identifier"], d_idx, sec_idx, i)
+                    }
 
-def process_data(data_dir: str = "cases_20250617") -> List[Dict]:
-    chunks = []
+def iter_data(data_dir: str = "cases_20250617") -> Iterator[Dict]:
+    """Lazily yield chunks for every case file, for index builders that consume an iterable."""
     for f in os.listdir(data_dir):
-        chunks.extend(process_json(os.path.join(data_dir, f)))
-    return chunks
\ No newline at end of file
+        yield from iter_json(os.path.join(data_dir, f))
+
+def process_json(fpath: str) -> List[Dict]:
+    return list(iter_json(fpath))
+
+def process_data(data_dir: str = "cases_20250617") -> List[Dict]:
+    return list(iter_data(data_dir))
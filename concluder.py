@@ -8,14 +8,20 @@ from textwrap import dedent
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# above this many prompt tokens, condense each case and reduce in a tree instead of one long call
+CONCLUDER_TOKEN_THRESHOLD = int(os.getenv("CONCLUDER_TOKEN_THRESHOLD", "12000"))
+CONCLUDER_REDUCE_FANOUT = int(os.getenv("CONCLUDER_REDUCE_FANOUT", "4"))
+CONCLUDER_MAX_CONCURRENCY = int(os.getenv("CONCLUDER_MAX_CONCURRENCY", "8"))
 
 # ---- LLM Setup ----
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_config import gemini_client_kwargs
 llm = ChatGoogleGenerativeAI(
     model= "gemini-2.5-pro",
     temperature=0.3,
     max_retries=2,
     google_api_key=GEMINI_API_KEY,
+    **gemini_client_kwargs(),
 )
 
 # ---- Agent Setup ----
@@ -30,9 +36,72 @@ agent = create_react_agent(
     )
 )
 
+condense_agent = create_react_agent(
+    model=llm,
+    tools=[],
+    prompt=dedent(
+        """
+        You are a 'Legal Assistant' agent. Your task is to condense the provided case for a single legal issue. Keep the issue, the core argument, the strongest supporting authorities and evidence, and the relief sought. Drop repetition and rhetoric. Do not add any preamble.
+        """
+    )
+)
+
+reduce_agent = create_react_agent(
+    model=llm,
+    tools=[],
+    prompt=dedent(
+        """
+        You are a 'Legal Assistant' agent. Your task is to merge the provided condensed cases into one combined summary of the arguments. Keep every distinct issue, argument and authority, and merge points that overlap. Do not write a closing statement and do not add any preamble.
+        """
+    )
+)
+
+# ---- Helper functions ----
+import re
+import tiktoken
+
+enc = tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(texts: list) -> int:
+    """Approximate prompt size; cl100k is close enough to Gemini's tokenizer for thresholding."""
+    return sum(len(enc.encode(t)) for t in texts)
+
+def dedupe_texts(user_texts: list) -> list:
+    """Drop repeated inputs (ignoring whitespace differences), keeping first occurrences in order."""
+    seen, out = set(), []
+    for t in user_texts:
+        key = re.sub(r"\s+", " ", t).strip()
+        if key and key not in seen:
+            seen.add(key)
+            out.append(t)
+    return out
+
+def _run_batch(agent, contents: list) -> list:
+    res = agent.batch(
+        [{"messages": [{"role": "user", "content": c}]} for c in contents],
+        config={"max_concurrency": CONCLUDER_MAX_CONCURRENCY},
+    )
+    return [r['messages'][-1].content for r in res]
+
+def condense_and_reduce(user_texts: list, threshold: int = None, fanout: int = None) -> list:
+    """
+    Map: condense every case in parallel.
+    Reduce: merge groups of `fanout` summaries in parallel, level by level, until they fit under the threshold.
+    """
+    threshold = threshold or CONCLUDER_TOKEN_THRESHOLD
+    fanout = max(2, fanout or CONCLUDER_REDUCE_FANOUT)
+    texts = _run_batch(condense_agent, user_texts)
+    while len(texts) > 1 and count_tokens(texts) > threshold:
+        groups = [texts[i:i+fanout] for i in range(0, len(texts), fanout)]
+        texts = _run_batch(reduce_agent, ["\n\n".join(g) for g in groups])
+    return texts
+
 # ---- Using the module ----
-def concluder(user_texts: list) -> str:
+def concluder(user_texts: list, threshold: int = None) -> str:
     """Generate a final concluding statement from the user texts."""
+    user_texts = dedupe_texts(user_texts)
+    if count_tokens(user_texts) > (threshold or CONCLUDER_TOKEN_THRESHOLD):
+        user_texts = condense_and_reduce(user_texts, threshold)
     combined_text = "\n\n".join(user_texts)
     res = agent.invoke(
         {
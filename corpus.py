@@ -0,0 +1,181 @@
+"""
+Registry of named, versioned case corpora held by the API process.
+
+Each loaded `CorpusVersion` bundles the chunk store and sparse retrieval index (a `segments.SegmentedIndex`) and
+the document store (case files on disk plus the Identifier -> filename map). Loading a new snapshot under an
+existing name swaps it in atomically: requests that already acquired the old version keep using it until they
+finish, and the old version is unloaded once its reference count drops to zero.
+
+Files added to or changed in a loaded corpus directory are picked up without a rebuild by `refresh`, which indexes
+them as delta segments searched alongside the base; set CORPUS_REFRESH_INTERVAL (seconds) to poll for them.
+"""
+
+import os
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+DEFAULT_CORPUS = os.getenv("DEFAULT_CORPUS", "cases")
+DEFAULT_CORPUS_DIR = os.getenv("DEFAULT_CORPUS_DIR", "cases_20250617")
+CORPORA_ROOT = os.getenv("CORPORA_ROOT", ".")  # POST /corpora may only load directories under this
+CORPUS_REFRESH_INTERVAL = float(os.getenv("CORPUS_REFRESH_INTERVAL", "0"))  # 0 disables the watcher
+
+
+class CorpusNotLoaded(KeyError):
+    pass
+
+
+def resolve_corpus_dir(data_dir: str, root: str = CORPORA_ROOT) -> str:
+    """
+    Resolve a requested corpus directory against root, following symlinks.
+    Raises ValueError if it lands outside root and FileNotFoundError if it is not a directory.
+    """
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, data_dir))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError("corpus directory '{}' is outside the corpora root".format(data_dir))
+    if not os.path.isdir(path):
+        raise FileNotFoundError("corpus directory '{}' does not exist".format(data_dir))
+    return path
+
+
+class CorpusVersion:
+    def __init__(self, name: str, version: str, data_dir: str):
+        from segments import SegmentedIndex
+
+        self.name = name
+        self.version = version
+        self.data_dir = data_dir
+        self.index = SegmentedIndex(data_dir).build()
+        self.id2name = self.index.id2name
+        self.refs = 0
+        self.retired = False
+
+    @property
+    def key(self) -> str:
+        return "{}@{}".format(self.name, self.version)
+
+    @property
+    def index_version(self) -> str:
+        """Cache key for the index contents; changes whenever a refresh or merge changes what search can return."""
+        return "{}#{}".format(self.key, self.index.generation)
+
+    def case_path(self, fname: str) -> str:
+        return os.path.join(self.data_dir, fname)
+
+    def unload(self):
+        self.index, self.id2name = None, None
+
+
+class CorpusRegistry:
+    def __init__(self):
+        self._current: Dict[str, CorpusVersion] = {}
+        self._retired: List[CorpusVersion] = []
+        self._lock = threading.Lock()
+        self._autoload_lock = threading.Lock()
+        self._loads = itertools.count(1)
+
+    def load(self, name: str, data_dir: str, version: Optional[str] = None) -> CorpusVersion:
+        """
+        Build a corpus snapshot and make it the current version of `name`.
+        The build happens outside the lock, so requests keep being served from the old version meanwhile.
+        Every load gets a distinct version ("<version or directory name>.<n>"), so reloading the same directory
+        never shares cache entries or a listing with the snapshot it replaces.
+        """
+        version = "{}.{}".format(version or os.path.basename(os.path.normpath(data_dir)), next(self._loads))
+        cv = CorpusVersion(name, version, data_dir)
+        with self._lock:
+            old = self._current.get(name)
+            self._current[name] = cv
+            if old is not None:
+                self._retire(old)
+        print("Loaded corpus", cv.key)
+        return cv
+
+    def unload(self, name: str):
+        with self._lock:
+            old = self._current.pop(name, None)
+            if old is not None:
+                self._retire(old)
+
+    def refresh(self, name: str) -> List[str]:
+        """
+        Index new, modified and removed case files of the current version of `name` in place.
+        Returns: the file names that changed
+        """
+        from researcher import research_cache
+
+        with self.acquire(name) as cv:
+            changed = cv.index.refresh()
+        if changed:
+            research_cache.invalidate(cv.key)
+            print("Refreshed corpus", cv.key, changed)
+        return changed
+
+    def watch(self, interval: float = CORPUS_REFRESH_INTERVAL) -> Optional[threading.Thread]:
+        """Refresh every loaded corpus every `interval` seconds on a daemon thread."""
+        if interval <= 0:
+            return None
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                with self._lock:
+                    names = list(self._current)
+                for name in names:
+                    try:
+                        self.refresh(name)
+                    except Exception as e:
+                        print("Corpus refresh failed for", name, e)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def _retire(self, cv: CorpusVersion):
+        from researcher import research_cache
+
+        cv.retired = True
+        research_cache.invalidate(cv.key)
+        if cv.refs == 0:
+            cv.unload()
+        else:
+            self._retired.append(cv)
+
+    def versions(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "current": {name: cv.version for name, cv in self._current.items()},
+                "draining": [{"corpus": cv.key, "refs": cv.refs} for cv in self._retired],
+            }
+
+    @contextmanager
+    def acquire(self, name: Optional[str] = None):
+        """Pin the current version of a corpus for the duration of a request."""
+        name = name or DEFAULT_CORPUS
+        with self._lock:
+            cv = self._current.get(name)
+        if cv is None:
+            if name != DEFAULT_CORPUS:
+                raise CorpusNotLoaded("corpus '{}' is not loaded".format(name))
+            with self._autoload_lock:
+                if DEFAULT_CORPUS not in self._current:
+                    self.load(DEFAULT_CORPUS, DEFAULT_CORPUS_DIR)
+        with self._lock:
+            cv = self._current.get(name)
+            if cv is None:  # unloaded between the autoload and here
+                raise CorpusNotLoaded("corpus '{}' is not loaded".format(name))
+            cv.refs += 1
+        try:
+            yield cv
+        finally:
+            with self._lock:
+                cv.refs -= 1
+                if cv.retired and cv.refs == 0:
+                    cv.unload()
+                    self._retired.remove(cv)
+
+
+registry = CorpusRegistry()
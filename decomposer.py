@@ -8,19 +8,24 @@ Note to frontend dev:
 
 from dotenv import load_dotenv
 import os
+import re
 from textwrap import dedent
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# sub-issues whose word overlap is at least this are researched once, as one cluster
+SUBISSUE_SIMILARITY_THRESHOLD = float(os.getenv("SUBISSUE_SIMILARITY_THRESHOLD", "0.8"))
 
 # ---- LLM Setup ----
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_config import gemini_client_kwargs
 
 llm = ChatGoogleGenerativeAI(
     model= "gemini-2.5-pro",
     temperature=0.3,
     max_retries=2,
     google_api_key=GEMINI_API_KEY,
+    **gemini_client_kwargs(),
 )
 
 # ---- Agent Setup ----
@@ -39,6 +44,36 @@ def get_subissues(result: str) -> list[str]:
     subissues = [line.strip("* ").strip() for line in lines if line.startswith("*")]
     return subissues
 
+STOPWORDS = {"a", "an", "the", "of", "to", "in", "on", "by", "for", "and", "or", "under", "whether", "its", "is", "be", "as", "with", "that", "this"}
+
+def _terms(issue: str) -> set[str]:
+    return {w for w in re.findall(r"\w+", issue.lower()) if w not in STOPWORDS}
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the content words of two sub-issues."""
+    ta, tb = _terms(a), _terms(b)
+    if not ta or not tb:
+        return float(a.strip().lower() == b.strip().lower())
+    return len(ta & tb) / len(ta | tb)
+
+def dedupe_subissues(subissues: list[str], threshold: float = None) -> tuple[list[str], dict[str, list[str]]]:
+    """
+    Cluster near-identical sub-issues so each cluster goes through the pipeline once.
+    Each sub-issue joins the first cluster whose representative it matches at or above the threshold.
+    Returns: the representative of each cluster (in first-seen order), and {representative: [merged duplicates]}
+    """
+    threshold = SUBISSUE_SIMILARITY_THRESHOLD if threshold is None else threshold
+    clusters: dict[str, list[str]] = {}
+    for issue in subissues:
+        for rep in clusters:
+            if similarity(issue, rep) >= threshold:
+                clusters[rep].append(issue)
+                break
+        else:
+            clusters[issue] = []
+    merged = {rep: dups for rep, dups in clusters.items() if dups}
+    return list(clusters), merged
+
 # ---- Using the module ----
 def decomposer(user_text: str) -> list[str]:
     """Decompose the user text into sub-issues."""
@@ -7,6 +7,7 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # ---- LLM Setup ----
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_config import gemini_client_kwargs
 
 # create LLM class
 llm = ChatGoogleGenerativeAI(
@@ -14,6 +15,7 @@ llm = ChatGoogleGenerativeAI(
     temperature=1.0,
     max_retries=2,
     google_api_key=GEMINI_API_KEY,
+    **gemini_client_kwargs(),
 )
 
 # tool binding if needed
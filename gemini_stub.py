@@ -0,0 +1,118 @@
+"""
+Local stand-in for the Gemini generateContent REST API, for load testing without spending quota.
+
+Each call sleeps for a log-normally distributed "time to first token" plus output_tokens / tokens_per_sec,
+and answers 429 RESOURCE_EXHAUSTED at a configurable rate or above a concurrency limit, like a real quota.
+The reply is a short bullet list, which every agent in the pipeline can parse (the decomposer needs bullets).
+
+Run with:
+    python gemini_stub.py --port 8089 --latency-median 2.0 --tokens-per-sec 80 --error-rate 0.02
+and start the API with GEMINI_API_ENDPOINT=http://127.0.0.1:8089 GEMINI_API_KEY=stub
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+REPLY = "\n".join([
+    "* Whether the tribunal has jurisdiction over the counterclaim under the arbitration clause.",
+    "* Whether the counterclaim is admissible given its connection to the primary claim.",
+    "* Whether the evidence establishes causation for the alleged environmental damage.",
+])
+
+
+class StubConfig:
+    def __init__(self, latency_median: float = 2.0, latency_sigma: float = 0.5, tokens_per_sec: float = 80.0,
+                 output_tokens: int = 400, error_rate: float = 0.0, max_concurrent: int = 0, seed: int = None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.max_concurrent = max_concurrent  # 0 means unlimited
+        self.rng = random.Random(seed)
+
+    def delay(self) -> float:
+        first_token = self.rng.lognormvariate(math.log(self.latency_median), self.latency_sigma) if self.latency_median > 0 else 0.0
+        return first_token + (self.output_tokens / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0)
+
+
+def make_handler(cfg: StubConfig):
+    active = {"n": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if ":generateContent" not in self.path:
+                return self._send(404, {"error": {"code": 404, "message": "unsupported path {}".format(self.path), "status": "NOT_FOUND"}})
+
+            with lock:
+                throttled = (cfg.max_concurrent and active["n"] >= cfg.max_concurrent) or cfg.rng.random() < cfg.error_rate
+                if not throttled:
+                    active["n"] += 1
+            if throttled:
+                return self._send(429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}})
+
+            try:
+                time.sleep(cfg.delay())
+            finally:
+                with lock:
+                    active["n"] -= 1
+
+            prompt_tokens = sum(len(p.get("text", "")) for c in body.get("contents", []) for p in c.get("parts", [])) // 4
+            self._send(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": REPLY}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": cfg.output_tokens,
+                    "totalTokenCount": prompt_tokens + cfg.output_tokens,
+                },
+                "modelVersion": self.path.split("/")[-1].split(":")[0],
+            })
+
+        def _send(self, status: int, out: Dict):
+            data = json.dumps(out).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8089, cfg: StubConfig = None):
+    server = ThreadingHTTPServer((host, port), make_handler(cfg or StubConfig()))
+    print("Gemini stub listening on http://{}:{}".format(host, port))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a local Gemini generateContent stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-median", type=float, default=2.0, help="median seconds before the first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal sigma of the first-token latency")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="answer 429 above this many in-flight calls (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    serve(args.host, args.port, StubConfig(args.latency_median, args.latency_sigma, args.tokens_per_sec,
+                                           args.output_tokens, args.error_rate, args.max_concurrent, args.seed))
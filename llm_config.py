@@ -0,0 +1,15 @@
+"""
+Shared connection settings for every ChatGoogleGenerativeAI client.
+
+Setting GEMINI_API_ENDPOINT (e.g. http://127.0.0.1:8089, see gemini_stub.py) points all clients at that
+endpoint over REST instead of the real Gemini API, so the pipeline can be load tested without spending quota.
+"""
+
+import os
+
+
+def gemini_client_kwargs() -> dict:
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    if not endpoint:
+        return {}
+    return {"transport": "rest", "client_options": {"api_endpoint": endpoint}}
@@ -0,0 +1,101 @@
+"""
+Concurrent load driver for the /generate/result endpoint.
+
+Sends requests at rising concurrency levels and reports throughput, p50/p95/p99 latency and error rate per
+level. Pair it with gemini_stub.py (GEMINI_API_ENDPOINT) so the run costs no Gemini quota; a small latency
+budget makes the planner skip NLI if the NLI model is not worth loading for the test.
+
+Every request has the same matter, so requests are sent with "fresh" to bypass the decomposition and research
+caches and measure the full pipeline; pass --cached to measure the warm, cache-hit path instead.
+
+Run with:
+    python loadtest.py --url http://127.0.0.1:8000 --levels 1 2 4 8 --requests 16
+"""
+
+import asyncio
+import time
+from typing import Dict, List
+import httpx
+import numpy as np
+
+PAYLOAD = {
+    "context": "You are assisting a legal team representing Fenoscadia Limited against an environmental counterclaim brought by the Republic of Kronos.",
+    "prompt": "Can you help me analyze how to challenge Kronos's environmental counterclaim, especially in terms of jurisdiction, admissibility, and merits?",
+    "tone": "aggressive",
+}
+
+
+async def run_level(url: str, concurrency: int, n_requests: int, payload: Dict, timeout: float) -> Dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one(client: httpx.AsyncClient):
+        async with sem:
+            start = time.monotonic()
+            try:
+                res = await client.post(url + "/generate/result", json=payload)
+                ok, kind = res.status_code == 200, str(res.status_code)
+            except httpx.HTTPError as e:
+                ok, kind = False, type(e).__name__
+            if ok:
+                latencies.append(time.monotonic() - start)
+            else:
+                errors[kind] = errors.get(kind, 0) + 1
+
+    start = time.monotonic()
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        await asyncio.gather(*[one(client) for _ in range(n_requests)])
+    elapsed = time.monotonic() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist() if latencies else (float("nan"),) * 3
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_s": p50,
+        "p95_s": p95,
+        "p99_s": p99,
+        "error_rate": sum(errors.values()) / n_requests,
+        "errors": errors,
+    }
+
+
+def report(rows: List[Dict]):
+    print("{:>6} {:>6} {:>10} {:>9} {:>9} {:>9} {:>8}  {}".format("conc", "reqs", "rps", "p50 s", "p95 s", "p99 s", "err %", "errors"))
+    for r in rows:
+        print("{concurrency:>6} {requests:>6} {throughput_rps:>10.3f} {p50_s:>9.2f} {p95_s:>9.2f} {p99_s:>9.2f} {err:>8.1f}  {errors}".format(
+            err=100 * r["error_rate"], **r))
+
+
+async def main(url: str, levels: List[int], n_requests: int, payload: Dict, timeout: float) -> List[Dict]:
+    rows = []
+    for c in levels:
+        rows.append(await run_level(url, c, max(n_requests, c), payload, timeout))
+        report(rows[-1:])
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Load test /generate/result at rising concurrency")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=16, help="requests per concurrency level")
+    parser.add_argument("--latency-budget", type=float, default=None, help="forwarded as the request's latency_budget")
+    parser.add_argument("--timeout", type=float, default=900.0)
+    parser.add_argument("--cached", action="store_true", help="let requests hit the decomposition and research caches")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    payload = dict(PAYLOAD, fresh=not args.cached)
+    if args.latency_budget is not None:
+        payload["latency_budget"] = args.latency_budget
+    rows = asyncio.run(main(args.url, args.levels, args.requests, payload, args.timeout))
+    print()
+    report(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
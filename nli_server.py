@@ -0,0 +1,186 @@
+"""
+Standalone NLI scoring server, so that API workers share one copy of the NLI model.
+
+The server owns an `NLIStance` and micro-batches (premise, hypothesis) pairs that arrive from many
+concurrent requests within a small time window into a single forward pass. Workers talk to it through
+`NLIClient`, which has the same `score_pair` / `score_long` interface as `NLIStance`. `GET /info` reports the
+server's model, so workers plan research for the tier it actually runs.
+
+Run with:
+    python nli_server.py --port 8765
+and point the workers at it with NLI_SERVER_URL=http://127.0.0.1:8765
+"""
+
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Tuple
+import requests
+
+
+# ---- Server ----
+class MicroBatcher:
+    def __init__(self, nli, window_ms: float = 10.0, max_batch: int = 32):
+        self.nli = nli
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[Tuple[str, str], Future]]" = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, float]]:
+        """Queue pairs for the next batch and block until they are scored."""
+        futures = []
+        for pair in pairs:
+            fut = Future()
+            self._queue.put((pair, fut))
+            futures.append(fut)
+        return [fut.result() for fut in futures]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                scores = self.nli.score_pairs([pair for pair, _ in batch])
+                for (_, fut), sc in zip(batch, scores):
+                    fut.set_result(sc)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                # rescore one by one, so the failure stays with the request that caused it
+                for pair, fut in batch:
+                    try:
+                        fut.set_result(self.nli.score_pairs([pair])[0])
+                    except Exception as err:
+                        fut.set_exception(err)
+
+
+def _pairs(body: Dict) -> List[Tuple[str, str]]:
+    pairs = body["pairs"]
+    if not isinstance(pairs, list) or not all(
+            isinstance(p, list) and len(p) == 2 and all(isinstance(s, str) for s in p) for p in pairs):
+        raise ValueError("pairs must be a list of [premise, hypothesis] string pairs")
+    return [tuple(p) for p in pairs]
+
+
+def _long(body: Dict) -> Tuple[str, str, int]:
+    text, hypothesis, max_tokens = body["text"], body["hypothesis"], body.get("max_tokens", 200)
+    if not isinstance(text, str) or not isinstance(hypothesis, str):
+        raise ValueError("text and hypothesis must be strings")
+    if not isinstance(max_tokens, int) or isinstance(max_tokens, bool) or max_tokens <= 0:
+        raise ValueError("max_tokens must be a positive integer")
+    return text, hypothesis, max_tokens
+
+
+def make_handler(batcher: MicroBatcher):
+    from researcher import best_windows
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/info":
+                return self._send(200, {"model": batcher.nli.model_name})
+            self._send(404, {"error": "unknown path {}".format(self.path)})
+
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/score_pairs":
+                    pairs = _pairs(body)
+                elif self.path == "/score_long":
+                    text, hypothesis, max_tokens = _long(body)
+                else:
+                    return self._send(404, {"error": "unknown path {}".format(self.path)})
+            except (KeyError, TypeError, ValueError) as e:
+                return self._send(400, {"error": "bad request: {}".format(e)})
+            try:
+                if self.path == "/score_pairs":
+                    out = {"scores": batcher.submit(pairs)}
+                else:
+                    windows = batcher.nli.windows(text, max_tokens)
+                    out = best_windows(windows, batcher.submit([(w, hypothesis) for w in windows]))
+            except Exception as e:
+                # model failures (e.g. CUDA OOM) must still answer, or the client only sees a dropped connection
+                return self._send(500, {"error": "{}: {}".format(type(e).__name__, e)})
+            self._send(200, out)
+
+        def _send(self, status: int, out: Dict):
+            data = json.dumps(out).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, model_name: str = None, window_ms: float = 10.0, max_batch: int = 32):
+    from researcher import NLIStance
+
+    nli = NLIStance(model_name) if model_name else NLIStance()
+    server = ThreadingHTTPServer((host, port), make_handler(MicroBatcher(nli, window_ms, max_batch)))
+    print("NLI server listening on http://{}:{}".format(host, port))
+    server.serve_forever()
+
+
+# ---- Client ----
+class NLIClient:
+    """Thin drop-in for NLIStance that forwards scoring to the NLI server."""
+
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = 60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._model_name = None
+
+    @property
+    def model_name(self) -> str:
+        """The model the server scores with, fetched from /info on first use."""
+        if self._model_name is None:
+            res = self.session.get(self.url + "/info", timeout=self.timeout)
+            res.raise_for_status()
+            self._model_name = res.json()["model"]
+        return self._model_name
+
+    def _post(self, path: str, payload: Dict) -> Dict:
+        res = self.session.post(self.url + path, json=payload, timeout=self.timeout)
+        if not res.ok:
+            raise requests.HTTPError("NLI server {} on {}: {}".format(res.status_code, path, res.text), response=res)
+        return res.json()
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, float]]:
+        return self._post("/score_pairs", {"pairs": [list(p) for p in pairs]})["scores"]
+
+    def score_pair(self, premise: str, hypothesis: str) -> Dict[str, float]:
+        return self.score_pairs([(premise, hypothesis)])[0]
+
+    def score_long(self, text: str, hypothesis: str, max_tokens=200):
+        return self._post("/score_long", {"text": text, "hypothesis": hypothesis, "max_tokens": max_tokens})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve NLI stance scoring over localhost HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--window-ms", type=float, default=10.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.model, args.window_ms, args.max_batch)
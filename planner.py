@@ -0,0 +1,150 @@
+"""
+Deadline-aware execution planner for the research pipeline.
+
+Stage costs are measured as the pipeline runs (exponentially weighted moving averages, seeded with rough
+CPU priors) and used to pick retrieval depth, NLI model tier and NLI window size for a request's latency
+budget. When even the cheapest NLI plan does not fit, research degrades to retrieval-only labels.
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+NLI_TIERS = {
+    "large": "ynie/roberta-large-snli_mnli_fever_anli_R1_R2_R3-nli",
+    "base": "ynie/roberta-base-snli_mnli_fever_anli_R1_R2_R3-nli",
+}
+CHUNK_TOKENS = 700  # chunker.CHUNK_SIZE
+
+
+@dataclass(frozen=True)
+class ResearchPlan:
+    topk_retrieval: int = 3
+    topn_return: int = 3
+    nli_tier: Optional[str] = "large"  # None means retrieval-only labels
+    max_tokens: int = 200
+
+    @property
+    def nli_model(self) -> Optional[str]:
+        return NLI_TIERS.get(self.nli_tier)
+
+    @property
+    def use_nli(self) -> bool:
+        return self.nli_tier is not None
+
+
+DEFAULT_PLAN = ResearchPlan()
+
+# deepest first; the planner takes the first one whose estimate fits the budget
+CANDIDATE_PLANS = [
+    ResearchPlan(topk_retrieval=10, topn_return=5, nli_tier="large", max_tokens=200),
+    DEFAULT_PLAN,
+    ResearchPlan(topk_retrieval=3, topn_return=3, nli_tier="base", max_tokens=200),
+    ResearchPlan(topk_retrieval=3, topn_return=3, nli_tier="base", max_tokens=400),
+    ResearchPlan(topk_retrieval=2, topn_return=2, nli_tier="base", max_tokens=400),
+]
+
+
+class StageCosts:
+    """Per-stage latency estimates in seconds, updated from measurements."""
+
+    PRIORS = {
+        "retrieval": 5.0,            # per request: index build/lookup and query scoring
+        "nli_window:large": 0.6,     # per NLI window
+        "nli_window:base": 0.2,
+        "nli_load:large": 20.0,      # one-off model load per process
+        "nli_load:base": 6.0,
+        "case_builder": 40.0,        # per issue; case builders for different issues run one after another
+        "concluder": 40.0,
+        "weaknesses": 30.0,          # on the final statement
+        "issue_weaknesses": 20.0,    # speculative_weaknesses only, per issue's case, all in parallel
+        "reconcile": 10.0,           # speculative_weaknesses only, on the cheaper reconcile model
+    }
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._est: Dict[str, float] = dict(self.PRIORS)
+        self._lock = threading.Lock()
+
+    def get(self, stage: str) -> float:
+        return self._est.get(stage, 0.0)
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            prev = self._est.get(stage)
+            self._est[stage] = seconds if prev is None else (1 - self.alpha) * prev + self.alpha * seconds
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.monotonic()
+        yield
+        self.observe(stage, time.monotonic() - start)
+
+
+costs = StageCosts()
+_loaded_tiers = set()
+
+
+def mark_loaded(tier: str):
+    _loaded_tiers.add(tier)
+
+
+def tier_of(model_name: str) -> str:
+    """NLI tier of a model name; models outside NLI_TIERS are budgeted like the large tier."""
+    return next((t for t, name in NLI_TIERS.items() if name == model_name), "large")
+
+
+def server_tier() -> Optional[str]:
+    """Tier of the model held by the NLI server when NLI_SERVER_URL is set, else None."""
+    if not os.getenv("NLI_SERVER_URL"):
+        return None
+    from researcher import get_nli
+
+    tier = tier_of(get_nli().model_name)
+    mark_loaded(tier)
+    return tier
+
+
+def estimate(plan: ResearchPlan, n_issues: int) -> float:
+    """Estimated seconds for researching n_issues with this plan."""
+    total = costs.get("retrieval")
+    if plan.use_nli:
+        windows_per_chunk = math.ceil(CHUNK_TOKENS / plan.max_tokens)
+        total += n_issues * plan.topk_retrieval * windows_per_chunk * costs.get(f"nli_window:{plan.nli_tier}")
+        if plan.nli_tier not in _loaded_tiers:
+            total += costs.get(f"nli_load:{plan.nli_tier}")
+    return total
+
+
+def downstream_estimate(n_issues: int, speculative_weaknesses: bool = False) -> float:
+    """
+    Estimated seconds for everything after research.
+    With speculative_weaknesses the case builders run in parallel, per-issue weaknesses overlap the concluder,
+    and a reconcile pass follows.
+    """
+    if speculative_weaknesses:
+        return costs.get("case_builder") + max(costs.get("concluder"), costs.get("issue_weaknesses")) + costs.get("reconcile")
+    return n_issues * costs.get("case_builder") + costs.get("concluder") + costs.get("weaknesses")
+
+
+def plan_research(budget: Optional[float], n_issues: int, safety: float = 0.8) -> ResearchPlan:
+    """
+    Pick the deepest plan whose estimate fits within safety * budget seconds.
+    No budget keeps the default plan; a budget too small for any NLI plan gives retrieval-only labels.
+    With an NLI server only its model's tier is available, so every candidate is planned on that tier.
+    """
+    candidates = CANDIDATE_PLANS
+    tier = server_tier()
+    if tier is not None:
+        candidates = list(dict.fromkeys(replace(plan, nli_tier=tier) for plan in CANDIDATE_PLANS))
+    if budget is None:
+        return DEFAULT_PLAN if tier is None else replace(DEFAULT_PLAN, nli_tier=tier)
+    for plan in candidates:
+        if estimate(plan, n_issues) <= safety * budget:
+            return plan
+    # without NLI, retrieval depth costs next to nothing, so keep the default depth
+    return replace(DEFAULT_PLAN, nli_tier=None)
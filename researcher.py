@@ -1,22 +1,35 @@
 import re, json, math, numpy as np
-from typing import List, Dict, Tuple
-from sklearn.feature_extraction.text import TfidfVectorizer
+from typing import List, Dict, Tuple, Union, Iterable, Iterator, Optional
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import Pipeline, make_pipeline
 from sklearn.preprocessing import normalize
 from chunker import process_data
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from tqdm import tqdm
 import torch
 import os
+import sys
+import copy
+import time
+import threading
+from cachetools import LRUCache
 
 def normalize_text(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip()
 
-def build_tfidf(chunks: List[Dict], min_df=2, max_df=0.9) -> Tuple[TfidfVectorizer, np.ndarray, List[str], List[Dict]]:
+def _collect(chunks: Iterable[Dict], chunk_ids: List[str], metas: List[Dict]) -> Iterator[str]:
+    """Yield normalized texts for a single-pass fit_transform, recording ids and metas as the chunks go by."""
+    for c in chunks:
+        chunk_ids.append(c["ChunkID"])
+        metas.append({k:v for k,v in c.items() if k!="Content"})
+        yield normalize_text(c["Content"])
+
+def build_tfidf(chunks: Iterable[Dict], min_df=2, max_df=0.9) -> Tuple[TfidfVectorizer, np.ndarray, List[str], List[Dict]]:
     """
-    chunks: list of dicts with at least {'ChunkID','Content', ...}
+    chunks: list (or lazy iterator, e.g. chunker.iter_data) of dicts with at least {'ChunkID','Content', ...}
     Returns: fitted vectorizer, TF-IDF csr matrix (docs x vocab), chunk_ids, metas (WITHOUT Content)
     """
-    texts = [normalize_text(c["Content"]) for c in chunks]
+    chunk_ids, metas = [], []
     vec = TfidfVectorizer(
         lowercase=True,
         ngram_range=(1,2),
@@ -24,83 +37,336 @@ def build_tfidf(chunks: List[Dict], min_df=2, max_df=0.9) -> Tuple[TfidfVectoriz
         token_pattern=r"(?u)\b\w+\b",
         stop_words="english"
     )
-    X = vec.fit_transform(texts)
-    chunk_ids = [c["ChunkID"] for c in chunks]
-    metas = [{k:v for k,v in c.items() if k!="Content"} for c in chunks]
+    X = vec.fit_transform(_collect(chunks, chunk_ids, metas))
     return vec, X, chunk_ids, metas
 
+def build_hashed(chunks: Iterable[Dict], n_features=2**20, prune_below=0.0) -> Tuple[Pipeline, np.ndarray, List[str], List[Dict]]:
+    """
+    Memory-bounded alternative to build_tfidf: same tokenization, but terms are hashed into a fixed
+    n_features space (no vocabulary dict) and weights are stored as float32.
+    prune_below: drop postings whose L2-normalized weight is below this, then re-normalize rows
+    Returns: fitted vectorizer pipeline, TF-IDF csr matrix (docs x n_features), chunk_ids, metas (WITHOUT Content)
+    """
+    chunk_ids, metas = [], []
+    vec = make_pipeline(
+        HashingVectorizer(
+            lowercase=True,
+            ngram_range=(1,2),
+            token_pattern=r"(?u)\b\w+\b",
+            stop_words="english",
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        ),
+        TfidfTransformer()
+    )
+    X = vec.fit_transform(_collect(chunks, chunk_ids, metas)).astype(np.float32)
+    if prune_below > 0:
+        X.data[X.data < prune_below] = 0
+        X.eliminate_zeros()
+        X = normalize(X, copy=False)
+    return vec, X, chunk_ids, metas
+
+def build_index(chunks: Iterable[Dict], mode: str = None, **kwargs):
+    """
+    Build the sparse retrieval index. mode is "tfidf" (exact vocabulary) or "hashed" (fixed-size, float32);
+    defaults to the RETRIEVAL_INDEX_MODE environment variable, then "tfidf".
+    """
+    mode = mode or os.getenv("RETRIEVAL_INDEX_MODE", "tfidf")
+    if mode == "tfidf":
+        return build_tfidf(chunks, **kwargs)
+    if mode == "hashed":
+        return build_hashed(chunks, **kwargs)
+    raise ValueError("unknown index mode '{}', expected 'tfidf' or 'hashed'".format(mode))
+
+def index_nbytes(vec, X) -> int:
+    """Approximate in-memory size of an index: the CSR arrays plus the vocabulary dict, if any."""
+    size = X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    vocab = getattr(vec, "vocabulary_", None)
+    if vocab:
+        size += sys.getsizeof(vocab) + sum(sys.getsizeof(k) for k in vocab)
+    return size
+
+def compare_indexes(chunks: List[Dict], queries: List[str], topk=10, **hashed_kwargs) -> Dict[str, float]:
+    """
+    Measure the hashed index against the exact TF-IDF index on the same chunks.
+    Returns: mean overlap of the top-k results (recall@k of the exact results), and both index sizes in bytes
+    """
+    vec, X, _, _ = build_tfidf(chunks)
+    hvec, hX, _, _ = build_hashed(chunks, **hashed_kwargs)
+    exact = tfidf_search_many(vec, X, queries, topk=topk)
+    hashed = tfidf_search_many(hvec, hX, queries, topk=topk)
+    overlap = [len(set(e) & set(h)) / max(1, len(e)) for e, h in zip(exact, hashed)]
+    return {
+        "recall_at_k": float(np.mean(overlap)),
+        "tfidf_bytes": index_nbytes(vec, X),
+        "hashed_bytes": index_nbytes(hvec, hX),
+    }
+
 def tfidf_search(vec, X, query: str, topk=20) -> List[int]:
-    q_vec = vec.transform([normalize_text(query)])
-    scores = (X @ q_vec.T).toarray().ravel()
-    if topk >= len(scores): 
+    return tfidf_search_many(vec, X, [query], topk=topk)[0]
+
+def _topk(scores: np.ndarray, topk: int) -> List[int]:
+    if topk >= len(scores):
         return np.argsort(-scores).tolist()
     part = np.argpartition(-scores, topk)[:topk]
     return part[np.argsort(-scores[part])].tolist()
 
+def tfidf_search_many(vec, X, queries: List[str], topk=20) -> List[List[int]]:
+    """
+    Vectorizes all queries into one matrix and scores them with a single sparse product.
+    Returns: one list of top-k chunk indices per query
+    """
+    Q = vec.transform([normalize_text(q) for q in queries])
+    scores = (X @ Q.T).toarray()  # docs x queries
+    return [_topk(scores[:, j], topk) for j in range(scores.shape[1])]
+
 class NLIStance:
     def __init__(self, model_name="ynie/roberta-large-snli_mnli_fever_anli_R1_R2_R3-nli", device=None):
+        self.model_name = model_name
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.tok = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device).eval()
         self.idx2lbl = {0:"contradiction", 1:"neutral", 2:"entailment"}
+        # a fast tokenizer is not thread-safe: every call resets its shared truncation/padding state
+        self._tok_lock = threading.Lock()
 
     def score_pair(self, premise: str, hypothesis: str) -> Dict[str,float]:
-        enc = self.tok(premise, hypothesis, truncation=True, max_length=512, return_tensors="pt").to(self.device)
+        return self.score_pairs([(premise, hypothesis)])[0]
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> List[Dict[str,float]]:
+        """Score many (premise, hypothesis) pairs in one padded forward pass."""
+        if not pairs:
+            return []
+        premises, hypotheses = zip(*pairs)
+        with self._tok_lock:
+            enc = self.tok(list(premises), list(hypotheses), truncation=True, max_length=512,
+                           padding=True, return_tensors="pt")
+        enc = enc.to(self.device)
         with torch.no_grad():
-            logits = self.model(**enc).logits[0]
+            logits = self.model(**enc).logits
         probs = torch.softmax(logits, dim=-1).detach().cpu().numpy().tolist()
-        return {"contradiction": probs[0], "neutral": probs[1], "entailment": probs[2]}
+        return [{"contradiction": p[0], "neutral": p[1], "entailment": p[2]} for p in probs]
 
-    def score_long(self, text: str, hypothesis: str, max_tokens=200):
+    def windows(self, text: str, max_tokens=200) -> List[str]:
         sents = [s.strip() for s in re.split(r'(?<=[\.\?!])\s+', text) if s.strip()]
         windows, cur = [], ""
         for s in sents:
-            tlen = len(self.tok.tokenize((cur+" "+s).strip()))
+            with self._tok_lock:
+                tlen = len(self.tok.tokenize((cur+" "+s).strip()))
             if tlen > max_tokens and cur:
                 windows.append(cur); cur = s
             else:
                 cur = (cur + " " + s).strip()
         if cur: windows.append(cur)
-        best_e, best_c, snip_e, snip_c = 0.0, 0.0, "", ""
-        for w in windows or [text]:
-            sc = self.score_pair(w, hypothesis)
-            if sc["entailment"] > best_e: best_e, snip_e = sc["entailment"], w[:500]
-            if sc["contradiction"] > best_c: best_c, snip_c = sc["contradiction"], w[:500]
-        neutral = max(0.0, 1.0 - max(best_e, best_c))
-        return {"entailment": best_e, "contradiction": best_c, "neutral": neutral,
-                "support_snippet": snip_e, "oppose_snippet": snip_c}
+        return windows or [text]
+
+    def score_long(self, text: str, hypothesis: str, max_tokens=200):
+        windows = self.windows(text, max_tokens)
+        return best_windows(windows, self.score_pairs([(w, hypothesis) for w in windows]))
+
+def best_windows(windows: List[str], scores: List[Dict[str,float]]) -> Dict:
+    """Reduce per-window NLI scores to the strongest entailment and contradiction for the whole text."""
+    best_e, best_c, snip_e, snip_c = 0.0, 0.0, "", ""
+    for w, sc in zip(windows, scores):
+        if sc["entailment"] > best_e: best_e, snip_e = sc["entailment"], w[:500]
+        if sc["contradiction"] > best_c: best_c, snip_c = sc["contradiction"], w[:500]
+    neutral = max(0.0, 1.0 - max(best_e, best_c))
+    return {"entailment": best_e, "contradiction": best_c, "neutral": neutral,
+            "support_snippet": snip_e, "oppose_snippet": snip_c}
+
+_nli_models: Dict[str, NLIStance] = {}
+_nli_clients: Dict[str, "NLIClient"] = {}
+
+def get_nli(model_name: str = None):
+    """
+    Use the shared scoring server when NLI_SERVER_URL is set (the server owns its model, so model_name is ignored;
+    the client's model_name reports the server's), otherwise load the model in-process once and reuse it across calls.
+    """
+    url = os.getenv("NLI_SERVER_URL")
+    if url:
+        from nli_server import NLIClient
+        if url not in _nli_clients:
+            _nli_clients[url] = NLIClient(url)
+        return _nli_clients[url]
+    if model_name not in _nli_models:
+        _nli_models[model_name] = NLIStance(model_name) if model_name else NLIStance()
+    return _nli_models[model_name]
 
 def label(ent, con, thr=0.6, margin=0.05):
     if ent >= thr and ent >= con + margin: return "support"
     if con >= thr and con >= ent + margin: return "oppose"
     return "neutral"
 
+def _meta(c: Dict) -> Dict:
+    return {k:v for k,v in c.items() if k!="Content"}
+
+def _labelled(c: Dict, sc: Dict, id2name: Dict[str, str]) -> Dict:
+    return {
+        **_meta(c),
+        "fname": id2name[c["Identifier"]],
+        "support_conf": round(sc["entailment"],4),
+        "oppose_conf": round(sc["contradiction"],4),
+        "stance_label": label(sc["entailment"], sc["contradiction"]),
+        "support_snippet": sc["support_snippet"],
+        "oppose_snippet": sc["oppose_snippet"]
+    }
+
+def _split_by_label(results: List[Dict], topn_return: int) -> Dict[str, List[Dict]]:
+    support = sorted([r for r in results if r["stance_label"]=="support"], key=lambda x: x["support_conf"], reverse=True)[:topn_return]
+    oppose  = sorted([r for r in results if r["stance_label"]=="oppose"],  key=lambda x: x["oppose_conf"],   reverse=True)[:topn_return]
+    neutral = [r for r in results if r["stance_label"]=="neutral"][:topn_return]
+    retrieved = [r for r in results if r["stance_label"]=="retrieved"][:topn_return]  # unscored, in retrieval order
+    return {"support": support, "oppose": oppose, "neutral": neutral, "retrieved": retrieved}
+
 def issue_search_and_label(chunks: List[Dict], issue_prompt: str, stance_text: str,
                            id2name: Dict[str, str],
                            topk_retrieval=3, topn_return=3) -> Dict[str, List[Dict]]:
-    vec, X, ids, metas = build_tfidf(chunks)
+    vec, X, ids, metas = build_index(chunks)
     idxs = tfidf_search(vec, X, issue_prompt, topk=topk_retrieval)
 
-    nli = NLIStance()
+    nli = get_nli()
     results = []
     for i in tqdm(idxs):
         c = chunks[i]
         sc = nli.score_long(c["Content"], stance_text)
-        results.append({
-            **metas[i],
-            "fname": id2name[metas[i]["Identifier"]],
-            "ChunkID": ids[i],
-            "support_conf": round(sc["entailment"],4),
-            "oppose_conf": round(sc["contradiction"],4),
-            "stance_label": label(sc["entailment"], sc["contradiction"]),
-            "support_snippet": sc["support_snippet"],
-            "oppose_snippet": sc["oppose_snippet"]
-        })
+        results.append(_labelled(c, sc, id2name))
 
-    support = sorted([r for r in results if r["stance_label"]=="support"], key=lambda x: x["support_conf"], reverse=True)[:topn_return]
-    oppose  = sorted([r for r in results if r["stance_label"]=="oppose"],  key=lambda x: x["oppose_conf"],   reverse=True)[:topn_return]
-    neutral = [r for r in results if r["stance_label"]=="neutral"][:topn_return]
-    return {"support": support, "oppose": oppose, "neutral": neutral}
+    return _split_by_label(results, topn_return)
+
+def _retrieval_only(c: Dict, id2name: Dict[str, str]) -> Dict:
+    """Unscored result used when NLI is skipped, e.g. to meet a deadline; it lands in "retrieved"."""
+    return {
+        **_meta(c),
+        "fname": id2name[c["Identifier"]],
+        "support_conf": 0.0,
+        "oppose_conf": 0.0,
+        "stance_label": "retrieved",
+        "retrieval_only": True,
+        "snippet": c["Content"][:500],
+        "support_snippet": "",
+        "oppose_snippet": ""
+    }
+
+def issue_search_and_label_many(chunks: Optional[List[Dict]], issue_prompts: List[str], stance_text: Union[str, List[str]],
+                                id2name: Dict[str, str],
+                                topk_retrieval=3, topn_return=3,
+                                nli_model: str = None, max_tokens=200, use_nli=True,
+                                deadline: float = None, index: Union[Tuple, "SegmentedIndex"] = None,
+                                cache: "ResearchCache" = None, index_version: str = None) -> List[Dict[str, List[Dict]]]:
+    """
+    Batched version of issue_search_and_label for all sub-issues of one matter.
+    stance_text: a single stance shared by every issue, or one stance per issue
+    index: a prebuilt (vec, X, chunk_ids, metas) for these chunks, or a segments.SegmentedIndex (e.g. from
+           corpus.registry), in which case chunks may be None; built from chunks here if not given
+    cache, index_version: reuse earlier results for the same issue, stance and parameters on this index version;
+                          only the issues that miss are researched
+    deadline: time.monotonic() value; once the next NLI score is expected to overrun it, the remaining
+              chunks get retrieval-only labels instead
+    Returns: one {"support","oppose","neutral","retrieved"} dict per issue, in the order of issue_prompts;
+             "retrieved" holds the chunks that were not NLI-scored
+    """
+    stances = [stance_text] * len(issue_prompts) if isinstance(stance_text, str) else list(stance_text)
+    if len(stances) != len(issue_prompts):
+        raise ValueError("expected one stance per issue, got {} for {} issues".format(len(stances), len(issue_prompts)))
+    if not issue_prompts:
+        return []
+
+    if cache is not None and index_version is not None:
+        params = dict(topk_retrieval=topk_retrieval, topn_return=topn_return, nli_model=nli_model, max_tokens=max_tokens, use_nli=use_nli)
+        keys = [cache.key(issue, st, index_version, **params) for issue, st in zip(issue_prompts, stances)]
+        results = [cache.get(k) for k in keys]
+        missing = [j for j, r in enumerate(results) if r is None]
+        if missing:
+            fresh, degraded = _search_and_label(chunks, [issue_prompts[j] for j in missing], [stances[j] for j in missing], id2name,
+                                                deadline=deadline, index=index, **params)
+            for j, r, d in zip(missing, fresh, degraded):
+                results[j] = r
+                if not d:
+                    cache.put(keys[j], r)
+        print("Research cache: {} hit(s), {} miss(es)".format(len(keys) - len(missing), len(missing)))
+        return [copy.deepcopy(r) for r in results]
+
+    return _search_and_label(chunks, issue_prompts, stances, id2name, topk_retrieval, topn_return,
+                             nli_model, max_tokens, use_nli, deadline, index)[0]
+
+def _search_and_label(chunks: Optional[List[Dict]], issue_prompts: List[str], stances: List[str], id2name: Dict[str, str],
+                      topk_retrieval=3, topn_return=3, nli_model: str = None, max_tokens=200, use_nli=True,
+                      deadline: float = None, index: Union[Tuple, "SegmentedIndex"] = None) -> Tuple[List[Dict[str, List[Dict]]], List[bool]]:
+    """
+    Uncached body of issue_search_and_label_many.
+    Returns: the per-issue results, and per issue whether any of its retrieved chunks missed NLI because of the deadline
+    """
+    from planner import costs, mark_loaded, tier_of, CHUNK_TOKENS, NLI_TIERS
+
+    with costs.timed("retrieval"):
+        if hasattr(index, "search_many"):
+            per_issue = index.search_many(issue_prompts, topk=topk_retrieval)
+        else:
+            vec, X, _, _ = index or build_index(chunks)
+            per_issue = [[chunks[i] for i in idxs] for idxs in tfidf_search_many(vec, X, issue_prompts, topk=topk_retrieval)]
+
+    # sub-issues overlap heavily, so score each unique (chunk, stance) pair only once
+    by_id = {c["ChunkID"]: c for hits in per_issue for c in hits}
+    pairs = list(dict.fromkeys((c["ChunkID"], st) for hits, st in zip(per_issue, stances) for c in hits))
+    tier = tier_of(nli_model or NLI_TIERS["large"])
+    windows_per_chunk = math.ceil(CHUNK_TOKENS / max_tokens)
+    scored, skipped = {}, set()
+    if use_nli:
+        # only an in-process load is a cold start worth timing; a server already holds its model
+        cold, start = not os.getenv("NLI_SERVER_URL") and nli_model not in _nli_models, time.monotonic()
+        nli = get_nli(nli_model)
+        tier = tier_of(nli.model_name)
+        if cold:
+            costs.observe(f"nli_load:{tier}", time.monotonic() - start)
+        mark_loaded(tier)
+    for cid, st in tqdm(pairs):
+        c = by_id[cid]
+        expected = windows_per_chunk * costs.get(f"nli_window:{tier}")
+        if not use_nli or (deadline is not None and time.monotonic() + expected > deadline):
+            scored[(cid, st)] = _retrieval_only(c, id2name)
+            if use_nli:
+                skipped.add((cid, st))
+            continue
+        start = time.monotonic()
+        scored[(cid, st)] = _labelled(c, nli.score_long(c["Content"], st, max_tokens=max_tokens), id2name)
+        costs.observe(f"nli_window:{tier}", (time.monotonic() - start) / windows_per_chunk)
+
+    results = [_split_by_label([dict(scored[(c["ChunkID"], st)]) for c in hits], topn_return) for hits, st in zip(per_issue, stances)]
+    degraded = [any((c["ChunkID"], st) in skipped for c in hits) for hits, st in zip(per_issue, stances)]
+    return results, degraded
+
+class ResearchCache:
+    """
+    LRU cache of per-issue research results, keyed by normalized issue text, stance, retrieval/NLI
+    parameters and index version. Callers skip results degraded to retrieval-only labels by a deadline.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(issue: str, stance: str, index_version: str, **params) -> Tuple:
+        return (normalize_text(issue).lower(), normalize_text(stance).lower(), index_version,
+                os.getenv("RETRIEVAL_INDEX_MODE", "tfidf"), tuple(sorted(params.items())))
+
+    def get(self, key: Tuple):
+        with self._lock:
+            return self._cache.get(key)
+
+    def put(self, key: Tuple, result: Dict[str, List[Dict]]):
+        with self._lock:
+            self._cache[key] = copy.deepcopy(result)
+
+    def invalidate(self, index_version: str):
+        """Drop every result computed against this index version, including its "<version>#<generation>" refreshes."""
+        with self._lock:
+            for key in [k for k in self._cache if k[2] == index_version or k[2].startswith(index_version + "#")]:
+                del self._cache[key]
+
+research_cache = ResearchCache(int(os.getenv("RESEARCH_CACHE_SIZE", "1024")))
 
 def reverse_map(data_dir: str = "cases_20250617") -> Dict:
     """
@@ -0,0 +1,204 @@
+"""
+Segment-based incremental index over the case corpus, in the style of Lucene.
+
+The base segment is a full `build_index` fit (exact TF-IDF or hashed, per RETRIEVAL_INDEX_MODE).
+New or replaced case files are chunked into small delta segments that reuse the base vectorizer
+(frozen vocabulary and idf), so they are searchable immediately. Deletions and replacements are
+tracked per segment by case Identifier, and `merge` compacts every segment into a fresh base with
+refreshed idf, optionally on a background thread.
+"""
+
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+from chunker import process_json, iter_json
+from researcher import build_index, normalize_text, _topk
+
+
+class Segment:
+    def __init__(self, X, chunks: List[Dict]):
+        self.X = X
+        self.chunks = chunks
+        self.deleted = set()  # Identifiers tombstoned in this segment
+        self.dead = np.zeros(len(chunks), dtype=bool)  # row mask of tombstoned chunks, for search
+        self._rows: Dict[str, List[int]] = {}
+        for j, c in enumerate(chunks):
+            self._rows.setdefault(c["Identifier"], []).append(j)
+
+    def delete(self, identifier: str) -> bool:
+        """Returns: whether this removed live chunks"""
+        live = identifier in self._rows and identifier not in self.deleted
+        self.deleted.add(identifier)
+        self.dead[self._rows.get(identifier, [])] = True
+        return live
+
+    def live(self) -> List[Dict]:
+        return [c for c in self.chunks if c["Identifier"] not in self.deleted]
+
+
+class SegmentedIndex:
+    def __init__(self, data_dir: str = "cases_20250617", max_segments: int = 8, background_merge: bool = True):
+        self.data_dir = data_dir
+        self.max_segments = max_segments
+        self.background_merge = background_merge
+        self.segments: List[Segment] = []
+        self.vec = None
+        self.id2name: Dict[str, str] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._file_ids: Dict[str, str] = {}  # file name -> Identifier of the case it currently indexes
+        self._lock = threading.RLock()
+        self._merging: Optional[threading.Thread] = None
+        self._deleted_during_merge: Optional[List[str]] = None
+        self.generation = 0  # bumped on every change to the searchable contents
+
+    # ---- Building ----
+    def build(self) -> "SegmentedIndex":
+        """
+        Full fit over every file in data_dir, producing a single base segment.
+        Chunks are streamed into the vectorizer file by file; only the chunk store itself is kept, since NLI
+        scoring needs each retrieved chunk's Content.
+        """
+        chunks = []
+
+        def stream():
+            for fname in sorted(os.listdir(self.data_dir)):
+                fpath = os.path.join(self.data_dir, fname)
+                mtime, first = os.path.getmtime(fpath), len(chunks)
+                for c in iter_json(fpath):
+                    chunks.append(c)
+                    yield c
+                self._track(fname, mtime, chunks[first:first + 1])
+
+        vec, X, _, _ = build_index(stream())
+        with self._lock:
+            self.vec = vec
+            self.segments = [Segment(X, chunks)]
+        return self
+
+    def _track(self, fname: str, mtime: float, file_chunks: List[Dict]):
+        self._mtimes[fname] = mtime
+        if file_chunks:
+            self._file_ids[fname] = file_chunks[0]["Identifier"]
+            self.id2name[file_chunks[0]["Identifier"]] = fname
+
+    # ---- Updates ----
+    def add_file(self, fpath: str) -> bool:
+        """
+        Chunk one case file into a new delta segment, replacing the case that file name indexed before (even if
+        its Identifier changed) and any other copy of the same Identifier. A file without chunks only removes.
+        Returns: whether the searchable contents changed
+        """
+        fname = os.path.basename(fpath)
+        mtime = os.path.getmtime(fpath)  # taken before parsing, so a write during the parse is seen next refresh
+        file_chunks = process_json(fpath)
+        with self._lock:
+            old = self._file_ids.pop(fname, None)
+            changed = old is not None and self.delete(old)
+            if file_chunks:
+                X = self.vec.transform([normalize_text(c["Content"]) for c in file_chunks])
+                self.delete(file_chunks[0]["Identifier"])
+                self.segments.append(Segment(X, file_chunks))
+                self.generation += 1
+                changed = True
+            self._track(fname, mtime, file_chunks)
+        self._maybe_merge()
+        return changed
+
+    def delete(self, identifier: str) -> bool:
+        """
+        Tombstone every chunk of a case in all current segments.
+        id2name keeps the entry, so results already handed to in-flight requests can still name their file.
+        Returns: whether any live chunk was removed
+        """
+        with self._lock:
+            removed = any([seg.delete(identifier) for seg in self.segments])
+            if self._deleted_during_merge is not None:
+                self._deleted_during_merge.append(identifier)
+            if removed:
+                self.generation += 1
+            return removed
+
+    def refresh(self) -> List[str]:
+        """
+        Index files in data_dir that are new or modified since they were last seen, and delete cases whose file is gone.
+        Returns: the file names whose searchable contents changed
+        """
+        changed = []
+        present = set(os.listdir(self.data_dir))
+        for fname in [f for f in self._mtimes if f not in present]:
+            with self._lock:
+                old = self._file_ids.pop(fname, None)
+                del self._mtimes[fname]
+            if old is not None and self.delete(old):
+                changed.append(fname)
+        for fname in sorted(present):
+            fpath = os.path.join(self.data_dir, fname)
+            if self._mtimes.get(fname) != os.path.getmtime(fpath) and self.add_file(fpath):
+                changed.append(fname)
+        return changed
+
+    # ---- Merging ----
+    def _maybe_merge(self):
+        if len(self.segments) <= self.max_segments:
+            return
+        if not self.background_merge:
+            self.merge()
+        elif self._merging is None or not self._merging.is_alive():
+            self._merging = threading.Thread(target=self.merge, daemon=True)
+            self._merging.start()
+
+    def merge(self):
+        """Compact all segments into a new base segment, refitting the vectorizer on live chunks."""
+        with self._lock:
+            snapshot = list(self.segments)
+            chunks = [c for seg in snapshot for c in seg.live()]
+            self._deleted_during_merge = []
+        try:
+            vec, X, _, _ = build_index(chunks)
+        except Exception:
+            with self._lock:
+                self._deleted_during_merge = None
+            raise
+        with self._lock:
+            merged = Segment(X, chunks)
+            for identifier in self._deleted_during_merge:
+                merged.delete(identifier)
+            # segments added while merging were transformed with the old vectorizer, so re-project them
+            newer = [Segment(vec.transform([normalize_text(c["Content"]) for c in seg.chunks]), seg.chunks)
+                     for seg in self.segments[len(snapshot):]]
+            for old, new in zip(self.segments[len(snapshot):], newer):
+                for identifier in old.deleted:
+                    new.delete(identifier)
+            self.vec = vec
+            self.segments = [merged] + newer
+            self._deleted_during_merge = None
+            self.generation += 1
+
+    # ---- Searching ----
+    def search_many(self, queries: List[str], topk: int = 20) -> List[List[Dict]]:
+        """
+        Search the base and all delta segments for every query at once, skipping deleted cases.
+        Returns: one list of top-k chunks per query, best first
+        """
+        with self._lock:
+            vec, segments = self.vec, list(self.segments)
+        Q = vec.transform([normalize_text(q) for q in queries])
+        hits: List[List[Tuple[float, Dict]]] = [[] for _ in queries]
+        for seg in segments:
+            scores = (seg.X @ Q.T).toarray()  # docs x queries
+            scores[seg.dead] = -1.0
+            for q in range(len(queries)):
+                col = scores[:, q]
+                hits[q].extend((float(col[j]), seg.chunks[j]) for j in _topk(col, topk) if col[j] >= 0)
+        return [[c for _, c in sorted(h, key=lambda h: -h[0])[:topk]] for h in hits]
+
+    def search(self, query: str, topk: int = 20) -> List[Dict]:
+        return self.search_many([query], topk)[0]
+
+
+if __name__ == "__main__":
+    index = SegmentedIndex().build()
+    print("Indexed files since build:", index.refresh())
+    for chunk in index.search("jurisdiction over an environmental counterclaim brought by the host state", topk=5):
+        print(chunk["ChunkID"], index.id2name.get(chunk["Identifier"]))
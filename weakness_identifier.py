@@ -11,11 +11,21 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # ---- LLM Setup ----
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_config import gemini_client_kwargs
 llm = ChatGoogleGenerativeAI(
     model= "gemini-2.5-pro",
     temperature=0.3,
     max_retries=2,
     google_api_key=GEMINI_API_KEY,
+    **gemini_client_kwargs(),
+)
+# reconciling already-identified weaknesses is a lighter task over a longer input, so it gets a cheaper model
+reconcile_llm = ChatGoogleGenerativeAI(
+    model=os.getenv("RECONCILE_MODEL", "gemini-2.5-flash"),
+    temperature=0.3,
+    max_retries=2,
+    google_api_key=GEMINI_API_KEY,
+    **gemini_client_kwargs(),
 )
 
 # ---- Agent Setup ----
@@ -28,6 +38,13 @@ agent = create_react_agent(
     name="weakness_identifier_agent"
 )
 
+reconcile_agent = create_react_agent(
+    model=reconcile_llm,
+    tools=[],
+    prompt="You are a 'Legal Assistant' agent. You are given a final closing statement and weaknesses that were identified earlier in the individual case for each legal issue. Your sole task is to keep the weaknesses that still apply to the final closing statement, drop those the final statement has already addressed or no longer relies on, and add any weakness introduced by how the issues were combined. Present these weaknesses as a continuous paragraph. Do not use bullet points. Do not include any other text, analysis, or preamble.",
+    name="weakness_reconcile_agent"
+)
+
 # ---- Helper functions ----
 def get_weaknesses(result: str) -> list[str]:
     """Extract weaknesses from the agent's result string."""
@@ -55,6 +72,22 @@ def weakness_identifier(user_text: str) -> list[str]:
     # return weaknesses
     return result
 
+def reconcile_weaknesses(final_statement: str, issue_weaknesses: list[str]) -> str:
+    """Reconcile weaknesses found in each per-issue case against the final closing statement."""
+    earlier = "\n\n".join(f"Weaknesses in case {i+1}: {w}" for i, w in enumerate(issue_weaknesses))
+    res = reconcile_agent.invoke(
+        {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": f"<final_statement>\n{final_statement}\n</final_statement>\n\n<issue_weaknesses>\n{earlier}\n</issue_weaknesses>"
+                }
+            ]
+        }
+    )
+
+    return res['messages'][-1].content
+
 # this is a version of weakness identifier which returns the agent itself
 def weakness_identifier_agent() -> ChatGoogleGenerativeAI:
     """Return the agent for external use."""
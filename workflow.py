@@ -2,6 +2,11 @@
 
 from dotenv import load_dotenv
 import os
+import json
+import time
+import threading
+from dataclasses import asdict
+from cachetools import LRUCache
 from textwrap import dedent
 from pprint import pp
 
@@ -10,23 +15,49 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # --- LLM Setup ---
 from langchain_google_genai import ChatGoogleGenerativeAI
+from llm_config import gemini_client_kwargs
 llm = ChatGoogleGenerativeAI(
     model="gemini-2.5-pro",
     temperature=0.2,
     max_retries=2,
-    api_key=GEMINI_API_KEY)
+    api_key=GEMINI_API_KEY,
+    **gemini_client_kwargs())
 
 # --- Define Nodes ---
-def decomposer_node(context: str, user_prompt: str) -> list[str]:
-    """Decompose the user prompt into sub-issues"""
+# tone only affects case building, so reruns of the same matter reuse the decomposition (and then hit the research cache)
+_decomposition_cache = LRUCache(maxsize=256)
+_decomposition_lock = threading.Lock()  # LRUCache reorders itself on every read, so it is not thread-safe
+
+def decomposer_node(context: str, user_prompt: str, fresh: bool = False) -> list[str]:
+    """Decompose the user prompt into sub-issues; fresh ignores (and replaces) a cached decomposition"""
     from decomposer import decomposer
 
+    key = (" ".join(context.split()), " ".join(user_prompt.split()))
+    with _decomposition_lock:
+        cached = None if fresh else _decomposition_cache.get(key)
+    if cached is not None:
+        print("Reusing decomposition of this matter")
+        return list(cached)
+
     # combine context and user_prompt
     combined_prompt = f"<context>\n{context}</context>\n\n<user_prompt>\n{user_prompt}\n</user_prompt>"
     sub_issues = decomposer(combined_prompt)
+    with _decomposition_lock:
+        _decomposition_cache[key] = list(sub_issues)
 
     return sub_issues
 
+def dedupe_node(sub_issues: list[str]) -> dict:
+    """Merge near-duplicate sub-issues so each is researched and built once"""
+    from decomposer import dedupe_subissues
+
+    unique, merged = dedupe_subissues(sub_issues)
+    for rep, dups in merged.items():
+        print(f"Merged {len(dups)} duplicate(s) into sub-issue: {rep}")
+        for dup in dups:
+            print("  -", dup)
+    return {"sub_issues": unique, "merged_sub_issues": merged}
+
 # insert researcher and sorter nodes here
 def researcher_node(issue: str, stance: str = "Fenoscadia has not consented to arbitrate claims brought by Kronos."):
     from researcher import process_data, issue_search_and_label, reverse_map
@@ -36,58 +67,192 @@ def researcher_node(issue: str, stance: str = "Fenoscadia has not consented to a
     resp = issue_search_and_label(chunks, issue, stance, id2name)
     return resp
 
-def case_builder_node(issue: str, og_prompt: str, cases: dict[str, list[dict]], tone: str) -> str:
+def researcher_many_node(issues: list[str], stance: str = "Fenoscadia has not consented to arbitrate claims brought by Kronos.",
+                         plan=None, deadline: float = None, corpus=None, fresh: bool = False) -> list[dict]:
+    """Research all sub-issues with one retrieval pass and shared NLI scoring, against a pinned corpus version
+    fresh skips the research cache"""
+    from researcher import issue_search_and_label_many, research_cache
+    from planner import DEFAULT_PLAN
+    from corpus import registry
+
+    if corpus is None:
+        with registry.acquire() as cv:
+            return researcher_many_node(issues, stance, plan, deadline, cv, fresh)
+
+    plan = plan or DEFAULT_PLAN
+    resp = issue_search_and_label_many(None, issues, stance, corpus.id2name,
+                                       topk_retrieval=plan.topk_retrieval, topn_return=plan.topn_return,
+                                       nli_model=plan.nli_model, max_tokens=plan.max_tokens, use_nli=plan.use_nli,
+                                       deadline=deadline, index=corpus.index,
+                                       cache=None if fresh else research_cache, index_version=corpus.index_version)
+    return resp
+
+def case_builder_node(issue: str, og_prompt: str, cases: dict[str, list[dict]], tone: str, data_dir: str = "cases_20250617") -> str:
     """Build a case for the given issue"""
     from case_builder import case_builder
-    final_case = case_builder(issue, og_prompt, cases, tone)
+    from planner import costs
+
+    with costs.timed("case_builder"):
+        final_case = case_builder(issue, og_prompt, cases, tone, data_dir)
     return final_case
 
 def concluder_node(all_conclusions: list[str]) -> str:
     """Conclude the final output from all conclusions"""
     from concluder import concluder
+    from planner import costs
 
-    final_output = concluder(all_conclusions)
+    with costs.timed("concluder"):
+        final_output = concluder(all_conclusions)
     return final_output
 
 # add weakness identifier node here
-def weakness_identifier_node(user_text: str) -> list[str]:
-    """Identify weaknesses in the user text"""
+def weakness_identifier_node(user_text: str, stage: str = "weaknesses") -> list[str]:
+    """Identify weaknesses in the user text; stage is the cost key it is timed under"""
     from weakness_identifier import weakness_identifier
+    from planner import costs
 
-    weaknesses = weakness_identifier(user_text)
+    with costs.timed(stage):
+        weaknesses = weakness_identifier(user_text)
+    return weaknesses
+
+def weakness_reconciler_node(final_output: str, issue_weaknesses: list[str]) -> str:
+    """Reconcile per-issue weaknesses against the final output"""
+    from weakness_identifier import reconcile_weaknesses
+    from planner import costs
+
+    with costs.timed("reconcile"):
+        weaknesses = reconcile_weaknesses(final_output, issue_weaknesses)
     return weaknesses
 
 # --- Define workflow ---
-def workflow(context: str, user_prompt: str, tone: str) -> str:
-    """Main workflow function"""
+def workflow(context: str, user_prompt: str, tone: str, speculative_weaknesses: bool = False,
+             run_id: str = None, store=None, latency_budget: float = None, corpus: str = None, fresh: bool = False) -> str:
+    """Main workflow function, returning the final output"""
+    state = run_workflow(context, user_prompt, tone, speculative_weaknesses, run_id, store, latency_budget, corpus, fresh)
+    return state["final_output"]
+
+def run_workflow(context: str, user_prompt: str, tone: str, speculative_weaknesses: bool = False,
+                 run_id: str = None, store=None, latency_budget: float = None, corpus: str = None, fresh: bool = False) -> dict:
+    """Run the workflow and return the full run state
+
+    Every stage is checkpointed under run_id (a new one is generated if not given), so a failed run can be
+    picked up again with `resume(run_id)` without redoing the stages that already completed.
+
+    corpus names the registered case corpus to research against (the default corpus if not given); its current
+    version is pinned for the whole run, so a snapshot swapped in mid-run only affects later requests.
+
+    latency_budget (seconds) lets the planner trade research depth for speed so the request can finish in time.
+
+    With speculative_weaknesses, each issue's case is built and critiqued in parallel as soon as its research
+    is ready, the concluder runs while those critiques finish, and a light pass reconciles them at the end.
 
+    fresh bypasses the in-process decomposition and research caches (checkpoints of this run_id still apply),
+    e.g. to force a new decomposition of a matter or to load-test the full pipeline.
+    """
+    from checkpoint import CheckpointStore, Checkpointer
+    from corpus import registry
+
+    deadline = None if latency_budget is None else time.monotonic() + latency_budget
+    checkpoint = Checkpointer(store or CheckpointStore(), run_id)
     state = {
+        "run_id": checkpoint.run_id,
         "context": context,
         "user_prompt": user_prompt,
         "tone": tone,
     }
+    checkpoint.store.put(checkpoint.run_id, "inputs", {**state, "speculative_weaknesses": speculative_weaknesses,
+                                                        "latency_budget": latency_budget, "corpus": corpus, "fresh": fresh})
+    print('Run id:', checkpoint.run_id)
+
+    with registry.acquire(corpus) as cv:
+        state["corpus"] = cv.key
+        return _run_stages(state, checkpoint, cv, deadline, speculative_weaknesses, fresh)
+
+def _run_stages(state: dict, checkpoint, cv, deadline: float, speculative_weaknesses: bool, fresh: bool = False) -> dict:
+    """Every stage from decomposition to weaknesses, against the pinned corpus version cv"""
+    from planner import plan_research, downstream_estimate
 
     print('Setting up decomposition')
-    state["sub_issues"] = decomposer_node(state["context"], state["user_prompt"])
+    state["raw_sub_issues"] = checkpoint("decomposer", decomposer_node, state["context"], state["user_prompt"], fresh=fresh)
+    # checkpointed so a resume keeps the sub-issues that later stages were keyed on, whatever the threshold is now
+    deduped = checkpoint("dedupe", dedupe_node, state["raw_sub_issues"])
+    state["sub_issues"], state["merged_sub_issues"] = deduped["sub_issues"], deduped["merged_sub_issues"]
     
-    for issue in state["sub_issues"]:
+    research_deadline = None
+    if deadline is not None:
+        research_deadline = deadline - downstream_estimate(len(state["sub_issues"]), speculative_weaknesses)
+    plan = plan_research(None if research_deadline is None else research_deadline - time.monotonic(), len(state["sub_issues"]))
+    state["research_plan"] = asdict(plan)
+
+    print('Setting up research for all issues with plan:', plan)
+    researched = checkpoint("researcher", researcher_many_node, state["sub_issues"], plan=plan, deadline=research_deadline, corpus=cv, fresh=fresh)
+    if speculative_weaknesses:
+        return _speculative_tail(state, researched, checkpoint, cv)
+
+    for i, (issue, case) in enumerate(zip(state["sub_issues"], researched)):
         state[issue] = {}
-        print('Setting up research for issue:', issue)
-        state[issue]['case'] = researcher_node(issue)
+        state[issue]['case'] = case
         print("Setting up conclusion for issue:", issue)
-        state[issue]['conclusion'] = case_builder_node(issue, state["user_prompt"], state[issue]['case'], state["tone"])
+        state[issue]['conclusion'] = checkpoint(f"case_builder:{i}", case_builder_node, issue, state["user_prompt"], state[issue]['case'], state["tone"], cv.data_dir)
 
     print("Setting up conclusion")
     state["all_conclusions"] = [state[issue]['conclusion'] for issue in state["sub_issues"]]
 
     print("Final output")
-    state["final_output"] = concluder_node(state["all_conclusions"])
-    state["weaknesses"] = weakness_identifier_node(state["final_output"])
+    state["final_output"] = checkpoint("concluder", concluder_node, state["all_conclusions"])
+    state["weaknesses"] = checkpoint("weaknesses", weakness_identifier_node, state["final_output"])
 
-    with open('output.txt', 'w') as file:
-        file.write(str(state))
+    return _finish(state)
 
-    return state["final_output"]
+def _speculative_tail(state: dict, researched: list[dict], checkpoint, cv) -> dict:
+    """Case building, per-issue weakness analysis and the concluder, overlapped on a thread pool"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def build_and_critique(i: int, issue: str, case: dict):
+        print("Setting up conclusion for issue:", issue)
+        conclusion = checkpoint(f"case_builder:{i}", case_builder_node, issue, state["user_prompt"], case, state["tone"], cv.data_dir)
+        return conclusion, pool.submit(checkpoint, f"issue_weaknesses:{i}", weakness_identifier_node, conclusion, stage="issue_weaknesses")
+
+    with ThreadPoolExecutor(max_workers=2 * max(1, len(state["sub_issues"]))) as pool:
+        built = [pool.submit(build_and_critique, i, issue, case) for i, (issue, case) in enumerate(zip(state["sub_issues"], researched))]
+        for issue, case, fut in zip(state["sub_issues"], researched, built):
+            state[issue] = {'case': case}
+            state[issue]['conclusion'], state[issue]['weakness_future'] = fut.result()
+
+        print("Setting up conclusion")
+        state["all_conclusions"] = [state[issue]['conclusion'] for issue in state["sub_issues"]]
+
+        print("Final output")
+        state["final_output"] = checkpoint("concluder", concluder_node, state["all_conclusions"])
+        for issue in state["sub_issues"]:
+            state[issue]['weaknesses'] = state[issue].pop('weakness_future').result()
+
+    state["weaknesses"] = checkpoint("weaknesses", weakness_reconciler_node, state["final_output"], [state[issue]['weaknesses'] for issue in state["sub_issues"]])
+
+    return _finish(state)
+
+def _finish(state: dict) -> dict:
+    """Persist the run state to output/<run_id>.json and return it"""
+    os.makedirs("output", exist_ok=True)
+    with open(os.path.join("output", f"{state['run_id']}.json"), 'w') as file:
+        json.dump(state, file, indent=2, ensure_ascii=False)
+
+    return state
+
+def resume(run_id: str, store=None) -> str:
+    """Re-run a previous workflow run, skipping every stage that already has a checkpoint"""
+    return resume_run(run_id, store)["final_output"]
+
+def resume_run(run_id: str, store=None) -> dict:
+    """Like resume, but returns the full run state"""
+    from checkpoint import CheckpointStore
+
+    store = store or CheckpointStore()
+    inputs = store.get(run_id, "inputs")
+    return run_workflow(inputs["context"], inputs["user_prompt"], inputs["tone"],
+                        speculative_weaknesses=inputs.get("speculative_weaknesses", False),
+                        run_id=run_id, store=store, latency_budget=inputs.get("latency_budget"), corpus=inputs.get("corpus"),
+                        fresh=inputs.get("fresh", False))
 
 if __name__ == "__main__":
     context = dedent("""